@@ -1,15 +1,24 @@
 import xml.etree.ElementTree as ET
 from urllib.error import HTTPError, URLError
-import urllib.request
 import datetime
 import random
 import time
 import json
+import sys
+import os
+
+# Shared fetch layer lives in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fetcher
+import enrich
 
 # Current date for logging and file naming
 date = datetime.datetime.now()
 curr_date = f"{date.day}/{date.month}/{date.year}"
 
+# Directory the JSON files are written to (current directory by default)
+output_dir = ''
+
 # The Guardian RSS feed sections
 GUARDIAN_ARTICLE_URLS = (
     'world', 'uk-news', 'politics', 'business', 'technology',
@@ -21,7 +30,7 @@ GUARDIAN_ARTICLE_URLS = (
 def fetch_rss_feed(url):
     """Fetches and parses an RSS feed from a URL."""
     try:
-        return ET.parse(source=urllib.request.urlopen(url))
+        return fetcher.parse_feed(url)
     except (HTTPError, URLError) as err:
         print(f"Network error while fetching {url}: {err}")
     except ET.ParseError as err:
@@ -104,16 +113,17 @@ def get_guardian_articles(section):
 def write_json(data, filename):
     """Writes data to a JSON file."""
     try:
-        with open(filename, 'a', encoding='utf-8') as file:
+        with open(os.path.join(output_dir, filename), 'a', encoding='utf-8') as file:
             json.dump(data, file, ensure_ascii=False, indent=4)
             file.write(",\n")
     except IOError as err:
         print(f"Error writing to file {filename}: {err}")
 
 def scrape_guardian(section):
-    """Scrapes articles for a given Guardian section."""
+    """Scrapes articles for a given Guardian section, returning them (None or an empty list on failure)."""
     articles = get_guardian_articles(section)
     if articles:
+        enrich.enrich_articles(articles, "Guardian")
         data = {
             "date": curr_date,
             "website": "Guardian",
@@ -131,6 +141,13 @@ def scrape_guardian(section):
         }
         write_json(error_data, 'errorLog.json')
         print(f"Failed to download articles from Guardian section: {section}")
+    return articles
+
+def write_trends():
+    """Writes the run's top keywords and trending terms."""
+    summary = enrich.summarize_run("Guardian")
+    if summary:
+        write_json({"date": curr_date, **summary}, 'Guardian_trends.json')
 
 def main():
     """Main function to start Guardian scraping."""
@@ -140,6 +157,8 @@ def main():
         scrape_guardian(section)
         # Random delay between requests to avoid overwhelming the server
         time.sleep(random.uniform(1, 2))
+
+    write_trends()
     
     print("Guardian scraping completed!")
 
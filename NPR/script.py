@@ -5,13 +5,23 @@ import datetime
 import random
 import time
 import json
+import sys
+import os
 import ssl
 import re
 
+# Shared fetch layer lives in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fetcher
+import enrich
+
 # Current date for logging and file naming
 date = datetime.datetime.now()
 curr_date = f"{date.day}/{date.month}/{date.year}"
 
+# Directory the JSON files are written to (current directory by default)
+output_dir = ''
+
 # NPR RSS feed sections with their URLs
 NPR_ARTICLE_URLS = {
     'news': 'https://feeds.npr.org/1001/rss.xml',
@@ -35,6 +45,9 @@ def create_ssl_context():
     context.verify_mode = ssl.CERT_NONE
     return context
 
+# Built once and shared by every request
+SSL_CONTEXT = create_ssl_context()
+
 def fetch_rss_feed(url):
     """Fetches and parses an RSS feed from a URL."""
     try:
@@ -42,9 +55,7 @@ def fetch_rss_feed(url):
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         request = urllib.request.Request(url, headers=headers)
-        context = create_ssl_context()
-        response = urllib.request.urlopen(request, context=context)
-        return ET.parse(source=response)
+        return fetcher.parse_feed(request, context=SSL_CONTEXT)
     except (HTTPError, URLError) as err:
         print(f"Network error while fetching {url}: {err}")
     except ET.ParseError as err:
@@ -143,16 +154,17 @@ def get_npr_articles(section, url):
 def write_json(data, filename):
     """Writes data to a JSON file."""
     try:
-        with open(filename, 'a', encoding='utf-8') as file:
+        with open(os.path.join(output_dir, filename), 'a', encoding='utf-8') as file:
             json.dump(data, file, ensure_ascii=False, indent=4)
             file.write(",\n")
     except IOError as err:
         print(f"Error writing to file {filename}: {err}")
 
 def scrape_npr(section, url):
-    """Scrapes articles for a given NPR section."""
+    """Scrapes articles for a given NPR section, returning them (None or an empty list on failure)."""
     articles = get_npr_articles(section, url)
     if articles:
+        enrich.enrich_articles(articles, "NPR")
         data = {
             "date": curr_date,
             "website": "NPR",
@@ -170,6 +182,13 @@ def scrape_npr(section, url):
         }
         write_json(error_data, 'errorLog.json')
         print(f"Failed to download articles from NPR section: {section}")
+    return articles
+
+def write_trends():
+    """Writes the run's top keywords and trending terms."""
+    summary = enrich.summarize_run("NPR")
+    if summary:
+        write_json({"date": curr_date, **summary}, 'NPR_trends.json')
 
 def main():
     """Main function to start NPR scraping."""
@@ -179,6 +198,8 @@ def main():
         scrape_npr(section, url)
         # Random delay between requests to avoid overwhelming the server
         time.sleep(random.uniform(1.5, 3))
+
+    write_trends()
     
     print("NPR scraping completed!")
 
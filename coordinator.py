@@ -0,0 +1,401 @@
+import importlib.util
+import urllib.parse
+import threading
+import datetime
+import sqlite3
+import random
+import socket
+import time
+import sys
+import os
+
+import enrich
+
+# Current date for job keys, so each section is claimed once per day
+date = datetime.datetime.now()
+curr_date = f"{date.day}/{date.month}/{date.year}"
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(BASE_DIR, 'crawl_queue.db')
+
+# How long a claimed job stays owned without a heartbeat
+LEASE_SECONDS = 120
+HEARTBEAT_SECONDS = LEASE_SECONDS / 4
+MAX_ATTEMPTS = 3
+IDLE_SLEEP = 1.0
+
+# Outlet scripts: (module name, path, politeness delay range in seconds)
+OUTLETS = {
+    'main': ('news_main', 'script.py', (0.5, 1.5)),
+    'NYT': ('news_nyt', os.path.join('NYT', 'nytimes.py'), (1, 2)),
+    'Guardian': ('news_guardian', os.path.join('Guardian', 'GUARDIAN.py'), (1, 2)),
+    'NPR': ('news_npr', os.path.join('NPR', 'script.py'), (1.5, 3)),
+    'WashingtonPost': ('news_wapo', os.path.join('washingtonpost', 'script.py'), (1.5, 3)),
+}
+
+_modules = {}
+
+
+def load_outlet(outlet):
+    """Imports an outlet script by path, caching the module."""
+    if outlet not in _modules:
+        name, path, _ = OUTLETS[outlet]
+        spec = importlib.util.spec_from_file_location(name, os.path.join(BASE_DIR, path))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        # Each outlet writes its JSON files next to its own script
+        module.output_dir = os.path.dirname(spec.origin)
+        _modules[outlet] = module
+    return _modules[outlet]
+
+
+def build_jobs():
+    """Lists every (outlet, website, section, url) job across all scripts."""
+    main_mod = load_outlet('main')
+    jobs = []
+    for website, sections in (('BBC', main_mod.BBC_ARTICLE_URLS),
+                              ('CNN', main_mod.CNN_ARTICLE_URLS),
+                              ('RT', main_mod.RT_ARTICLE_URLS),
+                              ('guardian', ('titles', 'keywords'))):
+        for section in sections:
+            jobs.append(('main', website, section, main_mod.feed_url(section, website)))
+
+    for section in load_outlet('NYT').NYT_ARTICLE_URLS:
+        jobs.append(('NYT', 'NYT', section, f'https://rss.nytimes.com/services/xml/rss/nyt/{section}.xml'))
+
+    for section in load_outlet('Guardian').GUARDIAN_ARTICLE_URLS:
+        jobs.append(('Guardian', 'Guardian', section, f'https://www.theguardian.com/{section}/rss'))
+
+    for section, url in load_outlet('NPR').NPR_ARTICLE_URLS.items():
+        jobs.append(('NPR', 'NPR', section, url))
+
+    for section, url in load_outlet('WashingtonPost').WAPO_ARTICLE_URLS.items():
+        jobs.append(('WashingtonPost', 'WashingtonPost', section, url))
+    return jobs
+
+
+class ScrapeFailed(Exception):
+    """Raised when an outlet script could not download a section."""
+
+
+def run_job(outlet, website, section, url):
+    """Runs one section through its outlet's scrape function."""
+    module = load_outlet(outlet)
+    articles = None
+    if outlet == 'main':
+        articles = module.scrape(section, website)
+    elif outlet == 'NYT':
+        articles = module.scrape_nyt(section)
+    elif outlet == 'Guardian':
+        articles = module.scrape_guardian(section)
+    elif outlet == 'NPR':
+        articles = module.scrape_npr(section, url)
+    elif outlet == 'WashingtonPost':
+        articles = module.scrape_wapo(section, url)
+
+    # The scripts log their own failures and return nothing, so retries hinge on this
+    if not articles:
+        raise ScrapeFailed(f"Failed to download articles from {website} - {section}")
+    return articles
+
+
+def write_trends(outlet, website):
+    """Writes a website's keyword and trend summary through its outlet script."""
+    module = load_outlet(outlet)
+    if outlet == 'main':
+        module.write_trends(website)
+    else:
+        module.write_trends()
+
+
+def connect(db_path):
+    """
+    Opens the shared queue database, creating the tables if needed.
+
+    The rollback journal is used rather than WAL, because WAL relies on shared
+    memory and only works when every process is on the same host. Workers on
+    other nodes can share the file over a network filesystem, but only if it
+    provides working POSIX file locks. Without them, run every worker on one
+    machine.
+    """
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=DELETE')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY,
+            run_date TEXT NOT NULL,
+            outlet TEXT NOT NULL,
+            website TEXT NOT NULL,
+            section TEXT NOT NULL,
+            url TEXT NOT NULL,
+            host TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            owner TEXT,
+            lease_expires REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            UNIQUE (run_date, website, section)
+        )''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS hosts (
+            host TEXT PRIMARY KEY,
+            next_allowed REAL NOT NULL DEFAULT 0
+        )''')
+    # Enrichment totals merged from every worker, summarized once per run
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS trend_runs (
+            run_date TEXT NOT NULL,
+            website TEXT NOT NULL,
+            outlet TEXT NOT NULL,
+            articles INTEGER NOT NULL DEFAULT 0,
+            summarized INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (run_date, website)
+        )''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS trend_terms (
+            run_date TEXT NOT NULL,
+            website TEXT NOT NULL,
+            term TEXT NOT NULL,
+            score REAL NOT NULL,
+            count REAL NOT NULL,
+            delta REAL NOT NULL,
+            PRIMARY KEY (run_date, website, term)
+        )''')
+    return conn
+
+
+def enqueue_jobs(conn, jobs, run_date=curr_date):
+    """Adds jobs for a run date; sections already queued are left alone."""
+    added = 0
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for outlet, website, section, url in jobs:
+            host = urllib.parse.urlparse(url).hostname
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO jobs (run_date, outlet, website, section, url, host) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (run_date, outlet, website, section, url, host))
+            added += cursor.rowcount
+            conn.execute('INSERT OR IGNORE INTO hosts (host) VALUES (?)', (host,))
+        conn.execute('COMMIT')
+    except sqlite3.Error:
+        conn.execute('ROLLBACK')
+        raise
+    return added
+
+
+def claim_job(conn, worker_id):
+    """
+    Leases the next runnable job to a worker.
+
+    A job is runnable when it is pending, or when it is running but its lease
+    has expired because the owning worker stopped heartbeating. Expired jobs
+    that have already used MAX_ATTEMPTS are failed instead, so a section that
+    keeps killing its worker is not handed out forever. The job's host must
+    also be free: it is held for the whole lease, and finish_job releases it
+    after the politeness delay.
+    """
+    now = time.time()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', lease_expires = NULL, "
+            "error = COALESCE(error, 'Lease expired on the final attempt') "
+            "WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+            (now, MAX_ATTEMPTS))
+        row = conn.execute(
+            'SELECT jobs.id, jobs.outlet, jobs.website, jobs.section, jobs.url, jobs.host '
+            'FROM jobs JOIN hosts ON hosts.host = jobs.host '
+            "WHERE (jobs.status = 'pending' OR (jobs.status = 'running' AND jobs.lease_expires < ?)) "
+            'AND hosts.next_allowed <= ? '
+            'ORDER BY jobs.attempts, jobs.id LIMIT 1',
+            (now, now)).fetchone()
+        if row is None:
+            conn.execute('COMMIT')
+            return None
+
+        job_id, outlet, website, section, url, host = row
+        conn.execute(
+            "UPDATE jobs SET status = 'running', owner = ?, lease_expires = ?, attempts = attempts + 1 "
+            'WHERE id = ?',
+            (worker_id, now + LEASE_SECONDS, job_id))
+        conn.execute('UPDATE hosts SET next_allowed = ? WHERE host = ?', (now + LEASE_SECONDS, host))
+        conn.execute('COMMIT')
+    except sqlite3.Error:
+        conn.execute('ROLLBACK')
+        raise
+    return job_id, outlet, website, section, url
+
+
+def heartbeat(conn, job_id, worker_id):
+    """Extends a lease and its host hold; returns False if the job was reassigned."""
+    expires = time.time() + LEASE_SECONDS
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        cursor = conn.execute(
+            "UPDATE jobs SET lease_expires = ? WHERE id = ? AND owner = ? AND status = 'running'",
+            (expires, job_id, worker_id))
+        if cursor.rowcount == 1:
+            conn.execute(
+                'UPDATE hosts SET next_allowed = MAX(next_allowed, ?) '
+                'WHERE host = (SELECT host FROM jobs WHERE id = ?)',
+                (expires, job_id))
+        conn.execute('COMMIT')
+    except sqlite3.Error:
+        conn.execute('ROLLBACK')
+        raise
+    return cursor.rowcount == 1
+
+
+def finish_job(conn, job_id, worker_id, error=None, run=None):
+    """
+    Marks a job done, or puts it back in the queue until MAX_ATTEMPTS.
+
+    The job's host is released for the politeness delay counted from now, so
+    the next fetch waits for this one to end, however long it took. A
+    successful job's enrichment totals (run, from enrich.take_run) are merged
+    in the same transaction, and only if this worker still owns the job, so a
+    lost lease or a retried job never counts its articles twice.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if error is None:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', lease_expires = NULL, error = NULL "
+                "WHERE id = ? AND owner = ? AND status = 'running'",
+                (job_id, worker_id))
+        else:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "lease_expires = NULL, error = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                (MAX_ATTEMPTS, error, job_id, worker_id))
+        if cursor.rowcount == 1:
+            outlet, host = conn.execute('SELECT outlet, host FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            low, high = OUTLETS[outlet][2]
+            conn.execute('UPDATE hosts SET next_allowed = ? WHERE host = ?',
+                         (time.time() + random.uniform(low, high), host))
+            if error is None and run is not None:
+                merge_trends(conn, job_id, run)
+        conn.execute('COMMIT')
+    except sqlite3.Error:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def merge_trends(conn, job_id, run):
+    """Adds a job's enrichment totals to its website's shared run, inside the caller's transaction."""
+    run_date, outlet, website = conn.execute(
+        'SELECT run_date, outlet, website FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    conn.execute(
+        'INSERT INTO trend_runs (run_date, website, outlet, articles) VALUES (?, ?, ?, ?) '
+        'ON CONFLICT (run_date, website) DO UPDATE SET articles = articles + excluded.articles',
+        (run_date, website, outlet, run["articles"]))
+    conn.executemany(
+        'INSERT INTO trend_terms (run_date, website, term, score, count, delta) VALUES (?, ?, ?, ?, ?, ?) '
+        'ON CONFLICT (run_date, website, term) DO UPDATE SET score = score + excluded.score, '
+        'count = count + excluded.count, delta = delta + excluded.delta',
+        [(run_date, website, term, score, count, delta)
+         for term, (score, count, delta) in run["terms"].items()])
+
+
+def write_run_summaries(conn):
+    """
+    Writes one trends record per finished (run date, website).
+
+    A run is finished once none of its jobs are pending or running. Every
+    worker calls this on exit, and marking the run summarized is atomic, so
+    only one of them writes the record.
+    """
+    runs = conn.execute(
+        'SELECT run_date, website, outlet, articles FROM trend_runs r WHERE summarized = 0 '
+        'AND NOT EXISTS (SELECT 1 FROM jobs WHERE jobs.run_date = r.run_date '
+        "AND jobs.website = r.website AND jobs.status IN ('pending', 'running'))").fetchall()
+    for run_date, website, outlet, articles in runs:
+        cursor = conn.execute(
+            'UPDATE trend_runs SET summarized = 1 WHERE run_date = ? AND website = ? AND summarized = 0',
+            (run_date, website))
+        if cursor.rowcount != 1:
+            continue
+
+        terms = {term: (score, count, delta) for term, score, count, delta in conn.execute(
+            'SELECT term, score, count, delta FROM trend_terms WHERE run_date = ? AND website = ?',
+            (run_date, website))}
+        summary = enrich.build_summary(website, articles, terms)
+        load_outlet(outlet).write_json({"date": run_date, **summary}, f'{website}_trends.json')
+        conn.execute('DELETE FROM trend_terms WHERE run_date = ? AND website = ?', (run_date, website))
+
+
+def keep_alive(db_path, job_id, worker_id, stop):
+    """Heartbeats a job from its own connection until stopped."""
+    conn = connect(db_path)
+    try:
+        while not stop.wait(HEARTBEAT_SECONDS):
+            if not heartbeat(conn, job_id, worker_id):
+                print(f"Lost lease on job {job_id}")
+                break
+    finally:
+        conn.close()
+
+
+def pending_count(conn):
+    """Counts jobs that are queued or still leased."""
+    return conn.execute(
+        "SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running')").fetchone()[0]
+
+
+def work(db_path=DEFAULT_DB, worker_id=None):
+    """Claims and runs jobs until the queue is drained."""
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    conn = connect(db_path)
+    print(f"Worker {worker_id} started")
+
+    while True:
+        job = claim_job(conn, worker_id)
+        if job is None:
+            if pending_count(conn) == 0:
+                break
+            time.sleep(IDLE_SLEEP)
+            continue
+
+        job_id, outlet, website, section, url = job
+        stop = threading.Event()
+        beat = threading.Thread(target=keep_alive, args=(db_path, job_id, worker_id, stop), daemon=True)
+        beat.start()
+
+        error = None
+        try:
+            run_job(outlet, website, section, url)
+        except Exception as err:
+            error = str(err)
+            print(f"Job {website} - {section} failed: {err}")
+        finally:
+            stop.set()
+            beat.join()
+        # Taken even on failure, so a failed attempt's totals never leak into the next job
+        run = enrich.take_run(website)
+        finish_job(conn, job_id, worker_id, error, run)
+
+    write_run_summaries(conn)
+    conn.close()
+    print(f"Worker {worker_id} finished")
+
+
+def main():
+    """Enqueues today's jobs and/or runs a worker against the shared queue."""
+    args = sys.argv[1:]
+    command = args[0] if args else 'all'
+    db_path = args[1] if len(args) > 1 else DEFAULT_DB
+
+    if command in ('enqueue', 'all'):
+        conn = connect(db_path)
+        added = enqueue_jobs(conn, build_jobs())
+        conn.close()
+        print(f"Queued {added} new jobs for {curr_date}")
+    if command in ('work', 'all'):
+        work(db_path)
+    if command not in ('enqueue', 'work', 'all'):
+        print("Usage: python coordinator.py [enqueue|work|all] [queue.db]")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+import urllib.parse
+import threading
+import datetime
+import random
+import socket
+import time
+import sys
+
+import coordinator
+
+# Seconds between rounds for each website
+SCRAPE_INTERVALS = {
+    'BBC': 30 * 60,
+    'CNN': 30 * 60,
+    'RT': 30 * 60,
+    'guardian': 60 * 60,
+    'NYT': 60 * 60,
+    'Guardian': 60 * 60,
+    'NPR': 60 * 60,
+    'WashingtonPost': 60 * 60,
+}
+
+# How long a resolved address is reused before asking the resolver again
+DNS_TTL = 300
+
+_dns_cache = {}
+_dns_lock = threading.Lock()
+_getaddrinfo = socket.getaddrinfo
+
+# Per-host politeness shared by every website thread: host -> (lock, next allowed time)
+_hosts = {}
+_hosts_lock = threading.Lock()
+
+
+def cached_getaddrinfo(*args, **kwargs):
+    """Drop-in for socket.getaddrinfo that caches results for DNS_TTL seconds."""
+    key = (args, tuple(sorted(kwargs.items())))
+    now = time.monotonic()
+    with _dns_lock:
+        entry = _dns_cache.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+    result = _getaddrinfo(*args, **kwargs)
+    with _dns_lock:
+        _dns_cache[key] = (now + DNS_TTL, result)
+    return result
+
+
+def install_dns_cache():
+    """Routes every lookup made by urllib through the DNS cache."""
+    socket.getaddrinfo = cached_getaddrinfo
+
+
+def refresh_dates():
+    """Rolls the date stamp of every loaded outlet over to today."""
+    date = datetime.datetime.now()
+    curr_date = f"{date.day}/{date.month}/{date.year}"
+    for module in coordinator._modules.values():
+        module.curr_date = curr_date
+
+
+def group_jobs():
+    """Groups the coordinator's job list by website."""
+    groups = {}
+    for job in coordinator.build_jobs():
+        groups.setdefault(job[1], []).append(job)
+    return groups
+
+
+def acquire_host(host, stop):
+    """
+    Waits until a host is free and past its politeness delay.
+
+    Websites that share a host (the Guardian sitemap and sections) run on
+    separate threads, so the host is held for the whole fetch. Returns False
+    if the daemon is stopped while waiting.
+    """
+    with _hosts_lock:
+        entry = _hosts.setdefault(host, [threading.Lock(), 0.0])
+    entry[0].acquire()
+    wait = entry[1] - time.monotonic()
+    if wait > 0 and stop.wait(wait):
+        entry[0].release()
+        return False
+    return True
+
+
+def release_host(host, delay):
+    """Frees a host for the next fetch once delay seconds have passed."""
+    entry = _hosts[host]
+    entry[1] = time.monotonic() + delay
+    entry[0].release()
+
+
+def run_round(jobs, stop):
+    """Scrapes every section of one website, keeping each host's requests spaced out."""
+    for outlet, website, section, url in jobs:
+        host = urllib.parse.urlparse(url).hostname
+        if stop.is_set() or not acquire_host(host, stop):
+            break
+        try:
+            coordinator.run_job(outlet, website, section, url)
+        except Exception as err:
+            print(f"Job {website} - {section} failed: {err}")
+        finally:
+            release_host(host, random.uniform(*coordinator.OUTLETS[outlet][2]))
+    if jobs:
+        coordinator.write_trends(jobs[0][0], jobs[0][1])
+
+
+def website_loop(website, jobs, stop):
+    """Runs a website's rounds on its own timer until stopped."""
+    interval = SCRAPE_INTERVALS.get(website, 60 * 60)
+    while not stop.is_set():
+        started = time.monotonic()
+        refresh_dates()
+        run_round(jobs, stop)
+        print(f"Finished round for {website}")
+        stop.wait(max(0, interval - (time.monotonic() - started)))
+
+
+def run_threads(threads, stop):
+    """
+    Starts the website threads and waits for them.
+
+    On Ctrl-C each thread finishes the section it is on, so no archive is left
+    with a half-written record, and the threads are joined before returning.
+    """
+    for thread in threads:
+        thread.start()
+
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Stopping scraper daemon...")
+        stop.set()
+
+    for thread in threads:
+        thread.join()
+
+
+def run_once(groups):
+    """Scrapes every website once in parallel and returns, for cron."""
+    refresh_dates()
+    stop = threading.Event()
+    run_threads([threading.Thread(target=run_round, args=(jobs, stop)) for jobs in groups.values()], stop)
+
+
+def run_forever(groups):
+    """Keeps one timer thread per website alive until interrupted."""
+    stop = threading.Event()
+    run_threads([
+        threading.Thread(target=website_loop, args=(website, jobs, stop))
+        for website, jobs in groups.items()
+    ], stop)
+
+
+def main():
+    """Starts the long-lived scraper, or a single pass with 'once'."""
+    install_dns_cache()
+    groups = group_jobs()
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'once':
+        run_once(groups)
+        print("Scraping completed!")
+    else:
+        print("Starting scraper daemon...")
+        run_forever(groups)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+import threading
+import sqlite3
+import json
+import time
+import os
+import re
+
+try:
+    import numpy as np
+    import scipy.sparse as sp
+except ImportError:
+    np = None
+    sp = None
+
+# Keywords stored on each article, and terms listed in a run summary
+KEYWORDS_PER_ARTICLE = 5
+SUMMARY_TERMS = 20
+# Batches older than this drop out of the document frequency and trend baseline
+WINDOW_SECONDS = 24 * 60 * 60
+# The window is shared by every process and run through this database
+WINDOW_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'trend_window.db')
+
+TAG = re.compile(r'<[^>]+>')
+ENTITY = re.compile(r'&[#\w]+;')
+WORD = re.compile(r"[a-z][a-z'\-]*[a-z]")
+
+STOPWORDS = frozenset("""
+a about after again against all also an and any are as at be because been before
+being between both but by can could did do does down during each few for from
+further had has have he her here hers him his how i if in into is it its itself
+just me more most my new no nor not now of off on once one only or other our out
+over own said same says she should so some such than that the their them then
+there these they this those through to too under until up very was we were what
+when where which while who whom why will with would you your continue reading
+""".split())
+
+_lock = threading.Lock()
+_vocabulary = {}
+_terms = []
+# Rolling window of (timestamp, term indices, document frequencies, term counts, doc count)
+_window = []
+# Highest WINDOW_DB row already in _window
+_last_row = 0
+# Per-website accumulators for the current run: term -> summed tf-idf / counts
+_runs = {}
+
+
+def tokenize(text):
+    """Lowercases text, drops HTML markup and stopwords, and returns its words."""
+    if not text:
+        return []
+    text = ENTITY.sub(' ', TAG.sub(' ', text)).lower()
+    return [word for word in WORD.findall(text) if len(word) > 2 and word not in STOPWORDS]
+
+
+def _term_index(term):
+    """Returns a term's column, growing the shared vocabulary as needed."""
+    index = _vocabulary.get(term)
+    if index is None:
+        index = _vocabulary[term] = len(_terms)
+        _terms.append(term)
+    return index
+
+
+def _connect():
+    """Opens WINDOW_DB, creating the window table if needed."""
+    conn = sqlite3.connect(WINDOW_DB, timeout=30, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=DELETE')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS window (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            time REAL NOT NULL,
+            docs INTEGER NOT NULL,
+            terms TEXT NOT NULL
+        )''')
+    conn.execute('CREATE INDEX IF NOT EXISTS window_time ON window (time)')
+    return conn
+
+
+def _sync_window(conn, now):
+    """
+    Prunes WINDOW_DB and loads the batches stored since the last call.
+
+    Every batch, including this process's own, reaches the in-memory window
+    through here, so batches stored by other workers since the last call are
+    picked up and none is counted twice.
+    """
+    global _last_row
+    conn.execute('DELETE FROM window WHERE time < ?', (now - WINDOW_SECONDS,))
+    rows = conn.execute('SELECT id, time, docs, terms FROM window WHERE id > ? ORDER BY id',
+                        (_last_row,)).fetchall()
+    for row_id, timestamp, docs, terms in rows:
+        _last_row = row_id
+        terms = json.loads(terms)
+        indices = np.array([_term_index(term) for term, _, _ in terms], dtype=np.int64)
+        df = np.array([df for _, df, _ in terms], dtype=float)
+        counts = np.array([count for _, _, count in terms], dtype=float)
+        _window.append((timestamp, indices, df, counts, docs))
+
+
+def _store_window(conn, entry):
+    """Adds one batch to WINDOW_DB so later runs and other processes see it."""
+    timestamp, indices, df, counts, docs = entry
+    terms = json.dumps([[_terms[i], float(d), float(c)] for i, d, c in zip(indices, df, counts)],
+                       ensure_ascii=False)
+    conn.execute('INSERT INTO window (time, docs, terms) VALUES (?, ?, ?)', (timestamp, docs, terms))
+
+
+def _compact():
+    """Drops terms no longer used by the window or any open run, renumbering the rest."""
+    global _terms
+    size = len(_terms)
+    used = np.zeros(size, dtype=bool)
+    for _, indices, _, _, _ in _window:
+        used[indices] = True
+    for state in _runs.values():
+        for key in ("scores", "counts", "deltas"):
+            used[:len(state[key])] |= state[key] != 0
+
+    live = np.flatnonzero(used)
+    if len(live) == size:
+        return
+    remap = np.full(size, -1, dtype=np.int64)
+    remap[live] = np.arange(len(live))
+
+    _window[:] = [(t, remap[indices], df, counts, docs) for t, indices, df, counts, docs in _window]
+    for state in _runs.values():
+        for key in ("scores", "counts", "deltas"):
+            padded = np.concatenate([state[key], np.zeros(size - len(state[key]))])
+            state[key] = padded[live]
+    _terms = [_terms[i] for i in live]
+    _vocabulary.clear()
+    _vocabulary.update((term, index) for index, term in enumerate(_terms))
+
+
+def _expire(now):
+    """Drops batches older than WINDOW_SECONDS, and the terms only they used."""
+    live = [entry for entry in _window if now - entry[0] <= WINDOW_SECONDS]
+    if len(live) == len(_window):
+        return
+    _window[:] = live
+    _compact()
+
+
+def _window_totals(size):
+    """Sums document frequencies and term counts over the rolling window."""
+    df = np.zeros(size)
+    counts = np.zeros(size)
+    docs = 0
+    for _, indices, entry_df, entry_counts, entry_docs in _window:
+        df[indices] += entry_df
+        counts[indices] += entry_counts
+        docs += entry_docs
+    return df, counts, docs
+
+
+def _run_state(website, size):
+    """Returns a website's run accumulators, padded to the vocabulary size."""
+    state = _runs.setdefault(website, {"articles": 0, "scores": np.zeros(0),
+                                       "counts": np.zeros(0), "deltas": np.zeros(0)})
+    for key in ("scores", "counts", "deltas"):
+        if len(state[key]) < size:
+            state[key] = np.concatenate([state[key], np.zeros(size - len(state[key]))])
+    return state
+
+
+def enrich_articles(articles, website):
+    """
+    Adds tf-idf keywords to each article of a parsed batch, in place.
+
+    Titles and sublines/descriptions are tokenized once into a sparse
+    document-term matrix. Document frequencies come from the batch plus the
+    rolling window of earlier batches, which is persisted in WINDOW_DB so
+    cron runs and separate workers share it. Keywords therefore favour terms
+    that are rare in recent news. The batch is then added to the window and
+    to the website's run totals for summarize_run.
+    """
+    if np is None or not articles:
+        return articles
+
+    with _lock:
+        now = time.time()
+        conn = None
+        try:
+            conn = _connect()
+            _sync_window(conn, now)
+        except sqlite3.Error as err:
+            print(f"Error reading trend window {WINDOW_DB}: {err}")
+            if conn is not None:
+                conn.close()
+                conn = None
+        _expire(now)
+
+        rows = []
+        cols = []
+        for row, article in enumerate(articles):
+            text = f"{article.get('title') or ''} {article.get('subline') or article.get('description') or ''}"
+            for word in tokenize(text):
+                rows.append(row)
+                cols.append(_term_index(word))
+
+        size = len(_terms)
+        matrix = sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(articles), size))
+        matrix.sum_duplicates()
+
+        window_df, window_counts, window_docs = _window_totals(size)
+        batch_df = np.bincount(matrix.indices, minlength=size).astype(float)
+        batch_counts = np.asarray(matrix.sum(axis=0)).ravel()
+
+        docs = window_docs + len(articles)
+        idf = np.log((1 + docs) / (1 + window_df + batch_df)) + 1
+        tfidf = sp.diags(1.0 / np.asarray(matrix.sum(axis=1)).ravel().clip(min=1)) @ matrix @ sp.diags(idf)
+        tfidf = tfidf.tocsr()
+        tfidf.sort_indices()
+
+        # Rank every row's terms at once: sort by row, then by descending score
+        row_ids = np.repeat(np.arange(len(articles)), np.diff(tfidf.indptr))
+        order = np.lexsort((-tfidf.data, row_ids))
+        rank = np.arange(len(order)) - tfidf.indptr[row_ids[order]]
+        top = order[rank < KEYWORDS_PER_ARTICLE]
+        for article in articles:
+            article["keywords"] = []
+        for row, column in zip(row_ids[top], tfidf.indices[top]):
+            articles[row]["keywords"].append(_terms[column])
+
+        state = _run_state(website, size)
+        state["articles"] += len(articles)
+        state["scores"] += np.asarray(tfidf.sum(axis=0)).ravel()
+        state["counts"] += batch_counts
+
+        # Trend delta: occurrences beyond what the window's word shares predict.
+        # With no window yet there is no baseline, so nothing counts as trending.
+        if window_counts.sum():
+            batch_share = batch_counts / max(batch_counts.sum(), 1)
+            window_share = window_counts / window_counts.sum()
+            state["deltas"] += (batch_share - window_share) * batch_counts.sum()
+
+        present = np.flatnonzero(batch_df)
+        entry = (now, present, batch_df[present], batch_counts[present], len(articles))
+        if conn is None:
+            _window.append(entry)
+        else:
+            try:
+                _store_window(conn, entry)
+            except sqlite3.Error as err:
+                print(f"Error writing trend window {WINDOW_DB}: {err}")
+                _window.append(entry)
+            finally:
+                conn.close()
+    return articles
+
+
+def take_run(website):
+    """Removes and returns a website's run totals as {term: (score, count, delta)}."""
+    if np is None:
+        return None
+
+    with _lock:
+        state = _runs.pop(website, None)
+        if state is None or not state["articles"]:
+            return None
+
+        terms = {}
+        for i in np.flatnonzero(state["counts"]):
+            terms[_terms[i]] = (float(state["scores"][i]), float(state["counts"][i]), float(state["deltas"][i]))
+        return {"articles": state["articles"], "terms": terms}
+
+
+def build_summary(website, articles, terms):
+    """Builds the top keywords and trending terms from run totals."""
+    keywords = sorted(terms, key=lambda term: -terms[term][0])[:SUMMARY_TERMS]
+    trending = sorted((term for term in terms if terms[term][2] > 0),
+                      key=lambda term: -terms[term][2])[:SUMMARY_TERMS]
+    return {
+        "website": website,
+        "articles": articles,
+        "keywords": [term for term in keywords if terms[term][0] > 0],
+        "trending": [
+            {"term": term, "count": int(terms[term][1]), "delta": round(terms[term][2], 2)}
+            for term in trending
+        ]
+    }
+
+
+def summarize_run(website):
+    """Returns and resets a website's top keywords and trending terms for this run."""
+    run = take_run(website)
+    if run is None:
+        return None
+    return build_summary(website, run["articles"], run["terms"])
@@ -0,0 +1,238 @@
+from email.utils import parsedate_to_datetime
+import datetime
+import codecs
+import json
+import glob
+import uuid
+import sys
+import os
+import re
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+    ds = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, 'dataset')
+# Remembers how far each archive has been exported, for incremental appends
+STATE_FILE = '_export_state.json'
+
+READ_SIZE = 1024 * 1024
+# write_json indents by four, so only a top-level record opens with '{' then a four-space key
+RECORD_START = re.compile(r'\{\n {4}"')
+SEPARATOR = re.compile(r'[ \t\r\n,]*')
+BATCH_ROWS = 50000
+
+COLUMNS = (
+    'website', 'date', 'section', 'title', 'link', 'summary', 'pub_date',
+    'author', 'guid', 'categories', 'keywords', 'image', 'image_count'
+)
+
+
+def arrow_schema():
+    """Normalized article schema shared by every outlet."""
+    return pa.schema([
+        ('website', pa.string()),
+        ('date', pa.date32()),
+        ('section', pa.string()),
+        ('title', pa.string()),
+        ('link', pa.string()),
+        ('summary', pa.string()),
+        ('pub_date', pa.timestamp('s', tz='UTC')),
+        ('author', pa.string()),
+        ('guid', pa.string()),
+        ('categories', pa.list_(pa.string())),
+        ('keywords', pa.list_(pa.string())),
+        ('image', pa.string()),
+        ('image_count', pa.int32()),
+    ])
+
+
+def iter_records(path, offset=0):
+    """
+    Streams the records of an archive written by write_json.
+
+    Archives are JSON objects separated by ",\n" rather than one JSON array,
+    so records are decoded one at a time from a rolling buffer. Yields
+    (record, end_offset) with the byte offset just past each record.
+
+    A record that fails to decode while another record start (RECORD_START)
+    follows it is torn: its offset is logged and reading resumes at the next
+    record. A torn record at the end of the file is left alone, since a
+    scraper may still be writing it.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    pos = 0
+    with open(path, 'rb') as file:
+        file.seek(offset)
+        eof = False
+        while True:
+            start = SEPARATOR.match(buffer, pos).end()
+            offset += len(buffer[pos:start].encode('utf-8'))
+            pos = start
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                next_record = RECORD_START.search(buffer, pos + 1)
+                if next_record:
+                    print(f"Skipping malformed record in {path} at byte {offset}")
+                    offset += len(buffer[pos:next_record.start()].encode('utf-8'))
+                    pos = next_record.start()
+                    continue
+                if eof:
+                    if pos < len(buffer):
+                        print(f"Stopping at incomplete record in {path} at byte {offset}")
+                    break
+                # Only trim what has been consumed when more is read
+                chunk = file.read(READ_SIZE)
+                eof = not chunk
+                buffer = buffer[pos:] + utf8.decode(chunk, final=eof)
+                pos = 0
+                continue
+            offset += len(buffer[pos:end].encode('utf-8'))
+            pos = end
+            yield record, offset
+
+
+def parse_run_date(value):
+    """Turns the scripts' d/m/yyyy run date into a date."""
+    try:
+        return datetime.datetime.strptime(value, '%d/%m/%Y').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_pub_date(value):
+    """Turns an RSS pubDate into a UTC datetime."""
+    try:
+        pub_date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if pub_date.tzinfo is None:
+        return pub_date.replace(tzinfo=datetime.timezone.utc)
+    return pub_date.astimezone(datetime.timezone.utc)
+
+
+def normalize_article(record, article):
+    """Maps one article from any outlet's schema onto COLUMNS."""
+    categories = []
+    for category in article.get('categories') or ():
+        name = category.get('name') if isinstance(category, dict) else category
+        if name:
+            categories.append(name)
+
+    images = article.get('images') or []
+    image = article.get('image')
+    if image is None and images:
+        image = images[0].get('url')
+
+    return {
+        'website': record.get('website'),
+        'date': parse_run_date(record.get('date')),
+        'section': record.get('section', record.get('dir')),
+        'title': article.get('title'),
+        'link': article.get('link'),
+        'summary': article.get('subline', article.get('description')),
+        'pub_date': parse_pub_date(article.get('pub_date')),
+        'author': article.get('author'),
+        'guid': article.get('guid'),
+        'categories': categories,
+        'keywords': article.get('keywords') or [],
+        'image': image,
+        'image_count': len(images) if images else int(image is not None),
+    }
+
+
+def iter_rows(paths, state):
+    """Yields normalized rows from every archive, resuming from state offsets."""
+    for path in paths:
+        key = os.path.relpath(os.path.abspath(path), BASE_DIR)
+        for record, offset in iter_records(path, state.get(key, 0)):
+            # Error log entries carry no articles and are skipped
+            for article in record.get('articles') or ():
+                yield normalize_article(record, article)
+            state[key] = offset
+
+
+def iter_batches(rows, schema):
+    """Groups rows into column-oriented record batches of BATCH_ROWS."""
+    columns = {name: [] for name in COLUMNS}
+    count = 0
+    for row in rows:
+        for name in COLUMNS:
+            columns[name].append(row[name])
+        count += 1
+        if count == BATCH_ROWS:
+            yield pa.RecordBatch.from_pydict(columns, schema=schema)
+            columns = {name: [] for name in COLUMNS}
+            count = 0
+    if count:
+        yield pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+def load_state(output_dir):
+    """Reads the per-archive export offsets."""
+    try:
+        with open(os.path.join(output_dir, STATE_FILE), encoding='utf-8') as file:
+            return json.load(file)
+    except (IOError, ValueError):
+        return {}
+
+
+def save_state(output_dir, state):
+    """Writes the per-archive export offsets."""
+    path = os.path.join(output_dir, STATE_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(state, file, indent=4)
+    os.replace(path + '.tmp', path)
+
+
+def default_archives():
+    """Finds every *_articles.json archive in the repository."""
+    return sorted(glob.glob(os.path.join(BASE_DIR, '*_articles.json')) +
+                  glob.glob(os.path.join(BASE_DIR, '*', '*_articles.json')))
+
+
+def export(paths, output_dir=DEFAULT_OUTPUT):
+    """
+    Appends new articles from the archives to a Parquet dataset.
+
+    The dataset is hive-partitioned by website and run date. Each call writes
+    new files with a unique name, and only reads records past the offsets
+    saved by the previous call.
+    """
+    if pa is None:
+        raise ImportError("Exporting to Parquet requires pyarrow (pip install pyarrow)")
+
+    os.makedirs(output_dir, exist_ok=True)
+    state = load_state(output_dir)
+    schema = arrow_schema()
+    ds.write_dataset(
+        iter_batches(iter_rows(paths, state), schema),
+        output_dir,
+        schema=schema,
+        format='parquet',
+        partitioning=['website', 'date'],
+        partitioning_flavor='hive',
+        basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+        existing_data_behavior='overwrite_or_ignore'
+    )
+    # Offsets only move forward once the batches are safely on disk
+    save_state(output_dir, state)
+
+
+def main():
+    """Exports the archives given on the command line, or all of them."""
+    output_dir = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_OUTPUT
+    paths = sys.argv[2:] or default_archives()
+    export(paths, output_dir)
+    print(f"Exported {len(paths)} archives to {output_dir}")
+
+
+if __name__ == '__main__':
+    main()
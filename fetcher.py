@@ -0,0 +1,334 @@
+import xml.etree.ElementTree as ET
+from urllib.error import URLError
+import urllib.request
+import threading
+import datetime
+import hashlib
+import json
+import time
+import ssl
+import zlib
+import os
+import re
+
+# Largest body accepted after decompression, so one feed cannot exhaust memory
+MAX_RESPONSE_BYTES = 20 * 1024 * 1024
+# Socket timeout per read, and overall time allowed to stream one body
+SOCKET_TIMEOUT = 15
+STREAM_TIMEOUT = 60
+CHUNK_SIZE = 64 * 1024
+
+# One verified context for every https fetch that does not bring its own
+DEFAULT_SSL_CONTEXT = ssl.create_default_context()
+
+# Brotli is not offered: its Python decompressor cannot cap output per step
+ACCEPT_ENCODING = 'gzip, deflate'
+# Per-fetch transfer stats are appended here, in the archives' format
+TRANSFER_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'transferLog.json')
+# Also print each fetch's transfer stats
+LOG_TRANSFERS = False
+
+# Fall back to item-by-item parsing when a feed is not well-formed
+RECOVER_PARSE = True
+# Raw bodies of feeds that failed strict parsing, kept for offline replay
+FAILED_PAYLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'failed_payloads')
+
+ITEM_START = re.compile(rb'<item[\s>/]')
+ITEM_END = b'</item>'
+XML_DECLARATION = re.compile(rb'\s*<\?xml[^>]*\?>')
+XMLNS = re.compile(rb'xmlns(?::[\w.-]+)?\s*=\s*(?:"[^"]*"|\'[^\']*\')')
+ROOT_TAG = re.compile(rb'<([A-Za-z_][\w:.-]*)')
+
+# Per-feed transfer stats from the latest fetch, keyed by URL
+compression_stats = {}
+# Per-feed item failures from the latest recovering parse, keyed by URL
+parse_failures = {}
+_stats_lock = threading.Lock()
+
+
+class FeedTooLarge(URLError):
+    """Raised when a body grows past MAX_RESPONSE_BYTES."""
+
+
+class FeedTimeout(URLError):
+    """Raised when streaming a body takes longer than STREAM_TIMEOUT."""
+
+
+class FeedCorrupt(URLError):
+    """Raised when a compressed body is corrupt or truncated."""
+
+
+class _Identity:
+    """Stand-in decompressor for bodies sent without Content-Encoding."""
+
+    eof = True
+
+    def decompress(self, data, max_length=0):
+        return data
+
+
+class _Deflate:
+    """Decompresses 'deflate' bodies, which servers send zlib-wrapped or raw."""
+
+    def __init__(self):
+        self._obj = None
+        self.unconsumed_tail = b''
+
+    @property
+    def eof(self):
+        return self._obj is not None and self._obj.eof
+
+    def decompress(self, data, max_length=0):
+        if self._obj is None:
+            raw = (data[0] & 0x0f) != 8 if data else False
+            self._obj = zlib.decompressobj(-zlib.MAX_WBITS if raw else zlib.MAX_WBITS)
+        result = self._obj.decompress(data, max_length)
+        self.unconsumed_tail = self._obj.unconsumed_tail
+        return result
+
+    def flush(self):
+        return self._obj.flush() if self._obj is not None else b''
+
+
+def _decompressor(encoding):
+    """Picks a streaming decompressor for a Content-Encoding header."""
+    encoding = (encoding or '').strip().lower()
+    if encoding in ('gzip', 'x-gzip'):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        return _Deflate()
+    if encoding in ('', 'identity'):
+        return _Identity()
+    raise URLError(f"Unsupported Content-Encoding: {encoding}")
+
+
+def _set_read_timeout(response, seconds):
+    """Caps how long the next read on a response's socket may block."""
+    sock = getattr(getattr(response.fp, 'raw', None), '_sock', None)
+    if sock is not None:
+        sock.settimeout(seconds)
+
+
+def stream_body(request, context=None, max_bytes=None, timeout=None):
+    """
+    Yields the decompressed body of a request chunk by chunk.
+
+    Compression is negotiated through Accept-Encoding. Both the wire size and
+    the decompressed size are capped at max_bytes, and the whole transfer must
+    finish within timeout seconds. A corrupt or truncated compressed body
+    raises FeedCorrupt. Transfer sizes are kept in compression_stats and
+    appended to TRANSFER_LOG once the body has been read.
+    """
+    max_bytes = MAX_RESPONSE_BYTES if max_bytes is None else max_bytes
+    timeout = STREAM_TIMEOUT if timeout is None else timeout
+    if isinstance(request, str):
+        request = urllib.request.Request(request)
+    request.add_header('Accept-Encoding', ACCEPT_ENCODING)
+
+    url = request.full_url
+    deadline = time.monotonic() + timeout
+    wire = 0
+    size = 0
+    context = DEFAULT_SSL_CONTEXT if context is None else context
+    with urllib.request.urlopen(request, context=context, timeout=SOCKET_TIMEOUT) as response:
+        encoding = response.headers.get('Content-Encoding')
+        decompressor = _decompressor(encoding)
+        while True:
+            # read1 returns whatever has arrived, and the socket timeout is cut to
+            # the time left, so a body trickling in cannot outlive the deadline
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise FeedTimeout(f"Response from {url} took longer than {timeout}s")
+            _set_read_timeout(response, min(SOCKET_TIMEOUT, remaining))
+            try:
+                chunk = response.read1(CHUNK_SIZE)
+            except TimeoutError:
+                if time.monotonic() >= deadline:
+                    raise FeedTimeout(f"Response from {url} took longer than {timeout}s")
+                raise FeedTimeout(f"Read from {url} timed out after {SOCKET_TIMEOUT}s")
+            if not chunk:
+                break
+            wire += len(chunk)
+            if wire > max_bytes:
+                raise FeedTooLarge(f"Response from {url} exceeded {max_bytes} bytes")
+
+            # Bound each step so a compression bomb cannot expand unchecked
+            while chunk:
+                try:
+                    data = decompressor.decompress(chunk, max_bytes - size + 1)
+                except zlib.error as err:
+                    raise FeedCorrupt(f"Corrupt {encoding} body from {url}: {err}")
+                size += len(data)
+                if size > max_bytes:
+                    raise FeedTooLarge(f"Decompressed body from {url} exceeded {max_bytes} bytes")
+                if data:
+                    yield data
+                chunk = getattr(decompressor, 'unconsumed_tail', b'')
+
+        try:
+            tail = decompressor.flush() if hasattr(decompressor, 'flush') else b''
+        except zlib.error as err:
+            raise FeedCorrupt(f"Corrupt {encoding} body from {url}: {err}")
+        if not decompressor.eof:
+            raise FeedCorrupt(f"Truncated {encoding} body from {url}")
+        size += len(tail)
+        if size > max_bytes:
+            raise FeedTooLarge(f"Decompressed body from {url} exceeded {max_bytes} bytes")
+        if tail:
+            yield tail
+
+    date = datetime.datetime.now()
+    stats = {
+        "date": f"{date.day}/{date.month}/{date.year}",
+        "url": url,
+        "encoding": encoding or 'identity',
+        "compressed_bytes": wire,
+        "decompressed_bytes": size,
+        "ratio": round(size / wire, 2) if wire else None
+    }
+    with _stats_lock:
+        compression_stats[url] = stats
+        try:
+            with open(TRANSFER_LOG, 'a', encoding='utf-8') as file:
+                json.dump(stats, file, ensure_ascii=False, indent=4)
+                file.write(",\n")
+        except IOError as err:
+            print(f"Error writing to file {TRANSFER_LOG}: {err}")
+    if LOG_TRANSFERS:
+        print(f"Fetched {url}: {wire} bytes {stats['encoding']}, {size} decompressed (ratio {stats['ratio']})")
+
+
+def _recover_shell(prologue):
+    """Rebuilds the root and channel elements from the text before the first item."""
+    body = XML_DECLARATION.sub(b'', prologue, count=1)
+    match = ROOT_TAG.search(re.sub(rb'<!--.*?-->|<![^>]*>|<\?[^>]*\?>', b'', body, flags=re.S))
+    root_tag = match.group(1) if match else b'rss'
+    closing = b'</channel>' if b'<channel' in body and root_tag != b'channel' else b''
+    try:
+        return ET.fromstring(prologue + closing + b'</' + root_tag + b'>')
+    except ET.ParseError:
+        root = ET.Element(root_tag.decode('utf-8', 'replace'))
+        if closing:
+            ET.SubElement(root, 'channel')
+        return root
+
+
+def recover_feed(body, url, error):
+    """
+    Parses a malformed feed one <item> at a time, keeping every good item.
+
+    Each item is parsed on its own inside a wrapper that carries the feed's XML
+    declaration and namespace declarations, so a bad entity or byte only costs
+    the item it appears in. Failed items are returned with their index and
+    byte offset in the body. Raises the original error if no item is found.
+    """
+    starts = [match.start() for match in ITEM_START.finditer(body)]
+    if not starts:
+        raise error
+
+    prologue = body[:starts[0]]
+    declaration = XML_DECLARATION.match(prologue)
+    declaration = declaration.group(0).strip() if declaration else b''
+    namespaces = b' '.join(sorted(set(XMLNS.findall(prologue))))
+
+    root = _recover_shell(prologue)
+    channel = root.find('channel')
+    if channel is None:
+        channel = root
+
+    failures = []
+    for index, start in enumerate(starts):
+        next_start = starts[index + 1] if index + 1 < len(starts) else len(body)
+        end = body.find(ITEM_END, start, next_start)
+        segment = body[start:end + len(ITEM_END)] if end != -1 else body[start:next_start]
+        try:
+            wrapper = ET.fromstring(declaration + b'<recover ' + namespaces + b'>' + segment + b'</recover>')
+            channel.extend(wrapper)
+        except ET.ParseError as err:
+            failures.append({"index": index, "offset": start, "error": str(err)})
+    return ET.ElementTree(root), failures
+
+
+def save_payload(body, url, error, failures):
+    """Stores a failed body once, named by its hash, with a sidecar of failures."""
+    digest = hashlib.sha1(body).hexdigest()
+    path = os.path.join(FAILED_PAYLOAD_DIR, f'{digest}.xml')
+    if os.path.exists(path):
+        return path
+
+    date = datetime.datetime.now()
+    try:
+        os.makedirs(FAILED_PAYLOAD_DIR, exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(body)
+        with open(os.path.join(FAILED_PAYLOAD_DIR, f'{digest}.json'), 'w', encoding='utf-8') as file:
+            json.dump({
+                "date": f"{date.day}/{date.month}/{date.year}",
+                "url": url,
+                "error": str(error),
+                "failed_items": failures
+            }, file, ensure_ascii=False, indent=4)
+    except IOError as err:
+        print(f"Error saving payload from {url}: {err}")
+    return path
+
+
+def replay_payload(path):
+    """Re-runs the recovering parser on a payload saved by save_payload."""
+    with open(path, 'rb') as file:
+        body = file.read()
+    with open(os.path.splitext(path)[0] + '.json', encoding='utf-8') as file:
+        url = json.load(file)["url"]
+    try:
+        return ET.ElementTree(ET.fromstring(body)), []
+    except ET.ParseError as err:
+        return recover_feed(body, url, err)
+
+
+def parse_feed(request, context=None, max_bytes=None, timeout=None, recover=None):
+    """
+    Streams a feed into the XML parser and returns an ElementTree.
+
+    Chunks are not kept while parsing, so a good feed costs one pass. With
+    recover on, a ParseError stops the stream and the feed is fetched once
+    more into memory. The raw body is saved for replay before recover_feed
+    salvages the well-formed items, so even a feed with no usable item is
+    kept. Failures are recorded in parse_failures.
+    """
+    recover = RECOVER_PARSE if recover is None else recover
+    url = request if isinstance(request, str) else request.full_url
+    parser = ET.XMLParser()
+    stream = stream_body(request, context, max_bytes, timeout)
+    try:
+        for data in stream:
+            parser.feed(data)
+        return ET.ElementTree(parser.close())
+    except ET.ParseError as err:
+        if not recover:
+            raise
+        error = err
+    finally:
+        stream.close()
+
+    body = b''.join(stream_body(request, context, max_bytes, timeout))
+    try:
+        return ET.ElementTree(ET.fromstring(body))
+    except ET.ParseError as err:
+        error = err
+
+    tree = None
+    failures = None
+    try:
+        tree, failures = recover_feed(body, url, error)
+    finally:
+        path = save_payload(body, url, error, failures)
+        with _stats_lock:
+            parse_failures[url] = {
+                "error": str(error),
+                "payload": path,
+                "recovered_items": len(tree.getroot().findall('.//item')) if tree is not None else 0,
+                "failed_items": failures
+            }
+    print(f"Recovered {parse_failures[url]['recovered_items']} items from {url}, "
+          f"{len(failures)} failed (payload saved to {path})")
+    return tree
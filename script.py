@@ -1,16 +1,22 @@
 import xml.etree.ElementTree as ET
 from urllib.error import HTTPError, URLError
-import urllib.request
 import threading
 import datetime
 import random
 import time
 import json
+import os
+
+import enrich
+import fetcher
 
 # Current date for logging and file naming
 date = datetime.datetime.now()
 curr_date = f"{date.day}/{date.month}/{date.year}"
 
+# Directory the JSON files are written to (current directory by default)
+output_dir = ''
+
 # Directories for news sources
 BBC_ARTICLE_URLS = (
     'world', 'uk', 'business', 'politics', 'health',
@@ -32,7 +38,7 @@ RT_ARTICLE_URLS = ('news', 'uk', 'usa', 'sport', 'russia', 'business')
 def fetch_rss_feed(url):
     """Fetches and parses an RSS feed from a URL."""
     try:
-        return ET.parse(source=urllib.request.urlopen(url))
+        return fetcher.parse_feed(url)
     except (HTTPError, URLError) as err:
         print(f"Network error while fetching {url}: {err}")
     except ET.ParseError as err:
@@ -40,8 +46,8 @@ def fetch_rss_feed(url):
     return None
 
 
-def get_articles(dir, website):
-    """Fetches and parses articles for a given directory and website."""
+def feed_url(dir, website):
+    """Builds the feed URL for a given directory and website."""
     url = None
     if website == 'BBC':
         url = f'http://feeds.bbci.co.uk/news/{dir}/rss.xml'
@@ -51,8 +57,12 @@ def get_articles(dir, website):
         url = f'https://www.rt.com/rss/{dir}'
     elif website == 'guardian':
         url = 'https://www.theguardian.com/sitemaps/news.xml'
+    return url
+
 
-    tree = fetch_rss_feed(url)
+def get_articles(dir, website):
+    """Fetches and parses articles for a given directory and website."""
+    tree = fetch_rss_feed(feed_url(dir, website))
     if not tree:
         return None
 
@@ -77,7 +87,7 @@ def get_articles(dir, website):
 def write_json(data, filename):
     """Writes data to a JSON file."""
     try:
-        with open(filename, 'a', encoding='utf-8') as file:
+        with open(os.path.join(output_dir, filename), 'a', encoding='utf-8') as file:
             json.dump(data, file, ensure_ascii=False, indent=4)
             file.write(",\n")
     except IOError as err:
@@ -85,9 +95,10 @@ def write_json(data, filename):
 
 
 def scrape(dir, website):
-    """Scrapes articles for a given directory and website."""
+    """Scrapes articles for a given directory and website, returning them (None or an empty list on failure)."""
     articles = get_articles(dir, website)
     if articles:
+        enrich.enrich_articles(articles, website)
         data = {
             "date": curr_date,
             "website": website,
@@ -105,6 +116,14 @@ def scrape(dir, website):
         }
         write_json(error_data, 'errorLog.json')
         print(f"Failed to download articles from section: {dir}")
+    return articles
+
+
+def write_trends(website):
+    """Writes the run's top keywords and trending terms for a website."""
+    summary = enrich.summarize_run(website)
+    if summary:
+        write_json({"date": curr_date, **summary}, f'{website}_trends.json')
 
 
 def bbc_control():
@@ -112,6 +131,7 @@ def bbc_control():
     for target in BBC_ARTICLE_URLS:
         scrape(target, 'BBC')
         time.sleep(random.uniform(0.5, 1.5))
+    write_trends('BBC')
 
 
 def cnn_control():
@@ -119,6 +139,7 @@ def cnn_control():
     for target in CNN_ARTICLE_URLS:
         scrape(target, 'CNN')
         time.sleep(random.uniform(0.5, 1.5))
+    write_trends('CNN')
 
 
 def rt_control():
@@ -126,12 +147,14 @@ def rt_control():
     for target in RT_ARTICLE_URLS:
         scrape(target, 'RT')
         time.sleep(random.uniform(0.5, 1.5))
+    write_trends('RT')
 
 
 def guardian_control():
     """Controls scraping for Guardian."""
     scrape('titles', 'guardian')
     scrape('keywords', 'guardian')
+    write_trends('guardian')
 
 
 def main():
@@ -5,12 +5,22 @@ import datetime
 import random
 import time
 import json
+import sys
+import os
 import ssl
 
+# Shared fetch layer lives in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fetcher
+import enrich
+
 # Current date for logging and file naming
 date = datetime.datetime.now()
 curr_date = f"{date.day}/{date.month}/{date.year}"
 
+# Directory the JSON files are written to (current directory by default)
+output_dir = ''
+
 # Washington Post RSS feed sections with correct URLs
 WAPO_ARTICLE_URLS = {
     'politics': 'https://feeds.washingtonpost.com/rss/politics',
@@ -34,6 +44,9 @@ def create_ssl_context():
     context.verify_mode = ssl.CERT_NONE
     return context
 
+# Built once and shared by every request
+SSL_CONTEXT = create_ssl_context()
+
 def fetch_rss_feed(url):
     """Fetches and parses an RSS feed from a URL."""
     try:
@@ -43,12 +56,8 @@ def fetch_rss_feed(url):
         }
         request = urllib.request.Request(url, headers=headers)
         
-        # Create SSL context that ignores certificate verification
-        context = create_ssl_context()
-        
-        # Open URL with custom SSL context
-        response = urllib.request.urlopen(request, context=context)
-        return ET.parse(source=response)
+        # Open URL with the shared SSL context
+        return fetcher.parse_feed(request, context=SSL_CONTEXT)
     except (HTTPError, URLError) as err:
         print(f"Network error while fetching {url}: {err}")
     except ET.ParseError as err:
@@ -150,16 +159,17 @@ def get_wapo_articles(section, url):
 def write_json(data, filename):
     """Writes data to a JSON file."""
     try:
-        with open(filename, 'a', encoding='utf-8') as file:
+        with open(os.path.join(output_dir, filename), 'a', encoding='utf-8') as file:
             json.dump(data, file, ensure_ascii=False, indent=4)
             file.write(",\n")
     except IOError as err:
         print(f"Error writing to file {filename}: {err}")
 
 def scrape_wapo(section, url):
-    """Scrapes articles for a given Washington Post section."""
+    """Scrapes articles for a given Washington Post section, returning them (None or an empty list on failure)."""
     articles = get_wapo_articles(section, url)
     if articles:
+        enrich.enrich_articles(articles, "WashingtonPost")
         data = {
             "date": curr_date,
             "website": "WashingtonPost",
@@ -177,6 +187,13 @@ def scrape_wapo(section, url):
         }
         write_json(error_data, 'errorLog.json')
         print(f"Failed to download articles from Washington Post section: {section}")
+    return articles
+
+def write_trends():
+    """Writes the run's top keywords and trending terms."""
+    summary = enrich.summarize_run("WashingtonPost")
+    if summary:
+        write_json({"date": curr_date, **summary}, 'WashingtonPost_trends.json')
 
 def main():
     """Main function to start Washington Post scraping."""
@@ -186,6 +203,8 @@ def main():
         scrape_wapo(section, url)
         # Random delay between requests to avoid overwhelming the server
         time.sleep(random.uniform(1.5, 3))
+
+    write_trends()
     
     print("Washington Post scraping completed!")
 